@@ -1,8 +1,5 @@
-from Products.validation.config import validation
 from zope.i18nmessageid import MessageFactory
 
-from plone.app.collection.validators import NonJavascriptValidator
-
 PloneMessageFactory = MessageFactory('plone')
 
 
@@ -22,6 +19,4 @@ def initialize(context):
             extra_constructors=(constructor, ),
             ).initialize(context)
 
-validation.register(NonJavascriptValidator('javascriptDisabled'))
-
 __all__ = ('PloneMessageFactory', )
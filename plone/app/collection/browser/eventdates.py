@@ -0,0 +1,79 @@
+from DateTime import DateTime
+from Products.CMFPlone.i18nl10n import ulocalized_time
+from Products.Five.browser import BrowserView
+from zope.annotation.interfaces import IAnnotations
+
+CACHE_KEY = 'plone.app.collection.localized_dates'
+
+
+class EventDates(BrowserView):
+    """Compute the event dates of a whole listing batch at once.
+
+    The listing templates used to construct and compare DateTime objects and
+    localize them several times for every event. Here the dates are read
+    from the ``start`` and ``end`` catalog metadata in a single pass, and
+    formatted dates are cached per request by (timestamp, format).
+    """
+
+    def __call__(self):
+        return self
+
+    def _cache(self):
+        annotations = IAnnotations(self.request)
+        cache = annotations.get(CACHE_KEY)
+        if cache is None:
+            cache = annotations[CACHE_KEY] = {}
+        return cache
+
+    def localized(self, value, long_format=False, time_only=False):
+        """Cached replacement for the ``toLocalizedTime`` of the plone view.
+        """
+        if not value:
+            return value
+        if isinstance(value, DateTime):
+            # the localized string shows the time in the value's timezone
+            key = (value.timeTime(), value.timezone())
+        else:
+            key = value
+        key = (key, bool(long_format), bool(time_only))
+        cache = self._cache()
+        if key not in cache:
+            cache[key] = ulocalized_time(
+                value, long_format, time_only, context=self.context,
+                domain='plonelocales', request=self.request)
+        return cache[key]
+
+    def dates(self, batch):
+        """Map the paths of the events in ``batch`` to their dates.
+
+        Every value is a dictionary with the ``start`` and ``end`` DateTimes,
+        the ``sametime`` and ``samedate`` flags and the localized strings
+        needed by the event byline.
+        """
+        result = {}
+        for item in batch:
+            if item.Type() != 'Event':
+                continue
+            brain = getattr(item, '_brain', item)
+            start = getattr(brain, 'start', None) or DateTime(item.StartDate)
+            end = getattr(brain, 'end', None) or DateTime(item.EndDate)
+            start_time = start.timeTime()
+            end_time = end.timeTime()
+            sametime = start_time == end_time
+            samedate = end_time - start_time < 86400
+            dates = {
+                'start': start,
+                'end': end,
+                'sametime': sametime,
+                'samedate': samedate,
+            }
+            if sametime or not samedate:
+                dates['start_long'] = self.localized(start, long_format=True)
+            if not sametime and not samedate:
+                dates['end_long'] = self.localized(end, long_format=True)
+            if samedate and not sametime:
+                dates['start_date'] = self.localized(start)
+                dates['start_time'] = self.localized(start, time_only=True)
+                dates['end_time'] = self.localized(end, time_only=True)
+            result[item.getPath()] = dates
+        return result
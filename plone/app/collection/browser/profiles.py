@@ -0,0 +1,68 @@
+from Products.Five.browser import BrowserView
+from plone.protect import CheckAuthenticator
+
+from plone.app.collection import profiling
+from plone.app.collection.interfaces import ICollection
+
+
+class CollectionProfilesView(BrowserView):
+    """Show the last recorded collection render profiles.
+
+    Posting a collection path as ``enable`` or ``disable`` flags or unflags
+    that collection for profiling every render.
+    """
+
+    def __call__(self):
+        form = self.request.form
+        if self.request.get('REQUEST_METHOD') == 'POST':
+            CheckAuthenticator(self.request)
+            for name, enabled in (('enable', True), ('disable', False)):
+                path = form.get(name)
+                if path:
+                    collection = self.context.unrestrictedTraverse(
+                        path.strip(), None)
+                    if ICollection.providedBy(collection):
+                        profiling.setProfiling(collection, enabled)
+            if form.get('clear'):
+                profiling.PROFILES.clear()
+        return self.index()
+
+    def header(self):
+        return profiling.HEADER[len('HTTP_'):].replace('_', '-').title()
+
+    def profiles(self):
+        result = []
+        for profile in profiling.PROFILES:
+            result.append({
+                'path': profile.path,
+                'url': profile.url,
+                'total': '%.1f' % (profile.total * 1000),
+                'loads': profile.loads,
+                'getobject_calls': profile.getobject_calls,
+                'timings': [(name, '%.1f' % (seconds * 1000))
+                            for name, seconds in profile.timings],
+            })
+        return result
+
+
+class ProfileTimer(BrowserView):
+    """Time a part of a template if the request is being profiled.
+
+    Templates call ``start`` with the name of the part and ``stop`` after
+    it, e.g. around the entries of the listing macro.
+    """
+
+    _timer = None
+
+    def __call__(self):
+        return self
+
+    def start(self, name):
+        self._timer = profiling.timer(profiling.getProfile(self.request),
+                                      name)
+        self._timer.__enter__()
+
+    def stop(self):
+        if self._timer is not None:
+            self._timer.__exit__(None, None, None)
+            self._timer = None
@@ -0,0 +1,129 @@
+import json
+
+from Products.Five.browser import BrowserView
+from Products.Five.browser.pagetemplatefile import ViewPageTemplateFile
+
+MARKER = '<!--plone.app.collection.stream-->'
+CHUNK_SIZE = 10
+# largest batch for collections without limit, the default limit
+MAX_BATCH_SIZE = 1000
+
+# listing views whose entries can be streamed, and the element wrapping them
+LISTINGS = {
+    'standard_view': 'dl',
+    'summary_view': 'div',
+}
+
+
+class ListingEntries(BrowserView):
+    """Base for views rendering listing entries in chunks."""
+
+    entries = ViewPageTemplateFile('templates/listing_entries.pt')
+
+    def listing(self):
+        listing = self.request.get('listing')
+        if listing not in LISTINGS:
+            listing = self.context.getLayout()
+        if listing not in LISTINGS:
+            listing = 'standard_view'
+        return listing
+
+    def _int(self, name):
+        try:
+            return int(self.request.get(name))
+        except (TypeError, ValueError):
+            return None
+
+    def batch(self):
+        """Return the requested batch.
+
+        Invalid ``b_start`` and ``b_size`` values are ignored, and the batch
+        size is capped by the limit of the collection.
+        """
+        b_start = max(self._int('b_start') or 0, 0)
+        limit = self.context.getLimit() or MAX_BATCH_SIZE
+        b_size = self._int('b_size')
+        if b_size is None or not 0 < b_size <= limit:
+            b_size = limit
+        return self.context.results(b_start=b_start, b_size=b_size)
+
+    def chunks(self, batch):
+        chunk = []
+        for item in batch:
+            chunk.append(item)
+            if len(chunk) == CHUNK_SIZE:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def render(self, items, listing):
+        return self.entries(items=items, listing=listing)
+
+    def nextURL(self, listing, batch):
+        """Return the url of the JSON batch following ``batch`` or None."""
+        if batch.end >= batch.sequence_length:
+            return None
+        return '%s/@@listing_batch?listing=%s&b_start=%d&b_size=%d' % (
+            self.context.absolute_url(), listing, batch.end, batch.size)
+
+
+class StreamingView(ListingEntries):
+    """Render a collection listing progressively.
+
+    The page up to the listing is sent before the collection is queried,
+    then the entries of the batch are sent in chunks while they are
+    rendered, and finally the batch navigation and the rest of the page.
+    The main template can only be rendered as a whole, so the rest of the
+    page (portlets, footer) is rendered together with the first part.
+    Responses written this way are not post-processed by transforms such as
+    theming.
+    """
+
+    shell = ViewPageTemplateFile('templates/streaming_view.pt')
+    footer = ViewPageTemplateFile('templates/listing_footer.pt')
+
+    def __call__(self):
+        listing = self.listing()
+        page = self.shell()
+        head, tail = page.split(MARKER, 1)
+        response = self.request.response
+        response.setHeader('Content-Type', 'text/html; charset=utf-8')
+        response.write(head.encode('utf-8'))
+        batch = self.batch()
+        if batch:
+            element = LISTINGS[listing]
+            response.write('<%s class="collection-stream">' % element)
+            for chunk in self.chunks(batch):
+                response.write(self.render(chunk, listing).encode('utf-8'))
+            response.write('</%s>' % element)
+        footer = self.footer(batch=batch,
+                             next_url=self.nextURL(listing, batch))
+        response.write(footer.encode('utf-8'))
+        response.write(tail.encode('utf-8'))
+        return ''
+
+
+class BatchView(ListingEntries):
+    """Return a batch of listing entries as JSON.
+
+    Besides the rendered ``html`` of the entries, the result holds the url
+    of the ``next`` batch, or None after the last one.
+    """
+
+    def __call__(self):
+        listing = self.listing()
+        batch = self.batch()
+        items = list(batch)
+        self.request.response.setHeader('Content-Type', 'application/json')
+        return json.dumps({
+            'b_start': batch.start - 1,
+            'b_size': batch.size,
+            'total': batch.sequence_length,
+            'next': self.nextURL(listing, batch),
+            'items': [{'url': item.getURL(),
+                       'title': item.Title(),
+                       'description': item.Description()}
+                      for item in items],
+            'html': items and self.render(items, listing) or u'',
+        })
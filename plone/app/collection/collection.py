@@ -7,19 +7,30 @@ from Products.ATContentTypes.content import document, schemata
 from Products.Archetypes import atapi
 from Products.Archetypes.atapi import (BooleanField,
                                        BooleanWidget,
+                                       DisplayList,
                                        IntegerField,
                                        LinesField,
                                        IntegerWidget,
                                        InAndOutWidget,
+                                       SelectionWidget,
                                        StringField,
                                        StringWidget)
 from Products.CMFCore.permissions import ModifyPortalContent, View
 from Products.CMFCore.utils import getToolByName
+from Products.validation.config import validation
 from zope.interface import implements
 
 from plone.app.collection import PloneMessageFactory as _
 from plone.app.collection.config import ATCT_TOOLNAME, PROJECTNAME
+from plone.app.collection.covers import coverTag, selectCover
 from plone.app.collection.interfaces import ICollection
+from plone.app.collection.profiling import startProfile, timer
+from plone.app.collection.resultscache import cachedResults, wrapResults
+from plone.app.collection.validators import NonJavascriptValidator
+
+# The validator is only needed by the schema below, so it is registered here
+# instead of when the package is imported.
+validation.register(NonJavascriptValidator('javascriptDisabled'))
 
 
 CollectionSchema = document.ATDocumentSchema.copy() + atapi.Schema((
@@ -84,6 +95,25 @@ CollectionSchema = document.ATDocumentSchema.copy() + atapi.Schema((
                           u"'Tabular view' is selected in the display menu.")
             ),
         ),
+
+    StringField('cover_strategy',
+        required=False,
+        mode='rw',
+        default='daily',
+        vocabulary=DisplayList((
+            ('daily', _(u'A different image every day')),
+            ('first', _(u'The first image')),
+            ('recent', _(u'The most recently modified image')),
+            )),
+        enforceVocabulary=True,
+        write_permission=ModifyPortalContent,
+        widget=SelectionWidget(
+            label=_(u'Album cover'),
+            description=_(u"Select which image of a folder to show when "
+                          u"'Thumbnail view' is selected in the display "
+                          u"menu.")
+            ),
+        ),
 ))
 
 CollectionSchema.moveField('query', after='description')
@@ -132,6 +162,12 @@ class Collection(document.ATDocument, ObjectManager):
             sort_on = self.getSort_on()
         if b_size is None:
             b_size = self.getLimit()
+        profile = startProfile(self, getattr(self, 'REQUEST', None))
+        cached = cachedResults(self, sort_on, custom_query, profile)
+        if cached is not None:
+            with timer(profile, 'batch creation'):
+                return wrapResults(cached, batch=batch, b_start=b_start,
+                                   b_size=b_size, brains=brains)
         return self.getQuery(batch=batch, b_start=b_start, b_size=b_size, sort_on=sort_on, brains=brains, custom_query=custom_query)
 
     # for BBB with ATTopic
@@ -156,12 +192,21 @@ class Collection(document.ATDocument, ObjectManager):
         return [_mapping[field] for field in self.customViewFields]
 
     security.declareProtected(View, 'getFoldersAndImages')
-    def getFoldersAndImages(self):
-        """Get folders and images"""
+    def getFoldersAndImages(self, cover=None):
+        """Get folders and images
+
+        ``covers`` maps the folder paths to their album cover and
+        ``cover_tags`` to the thumbnail tag of the cover. The cover is
+        chosen with the ``cover`` strategy, by default the one selected on
+        the collection, see ``plone.app.collection.covers``.
+        """
+        if cover is None:
+            cover = self.getCover_strategy() or 'daily'
         catalog = getToolByName(self, 'portal_catalog')
         results = self.results(batch=False)
 
-        _mapping = {'results': results, 'images': {}, 'others': []}
+        _mapping = {'results': results, 'images': {}, 'others': [],
+                    'covers': {}, 'cover_tags': {}}
         portal_atct = getToolByName(self, 'portal_atct')
         image_types = getattr(portal_atct, 'image_types', [])
 
@@ -172,11 +217,19 @@ class Collection(document.ATDocument, ObjectManager):
                     'portal_type': image_types,
                     'path': item_path,
                 }
-                _mapping['images'][item_path] = IContentListing(catalog(query))
+                images = IContentListing(catalog(query))
+                _mapping['images'][item_path] = images
             elif item.portal_type in image_types:
-                _mapping['images'][item_path] = [item, ]
+                images = [item, ]
+                _mapping['images'][item_path] = images
             else:
                 _mapping['others'].append(item._brain)
+                continue
+            cover_image = selectCover(images, item_path, cover)
+            if cover_image is not None:
+                _mapping['covers'][item_path] = cover_image
+                _mapping['cover_tags'][item_path] = coverTag(
+                    images, item_path, cover, item.Description())
 
         _mapping['total_number_of_images'] = sum(map(len,
                                                 _mapping['images'].values()))
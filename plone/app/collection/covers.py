@@ -0,0 +1,58 @@
+"""Deterministic selection of album covers for the thumbnail view.
+
+Covers are chosen from catalog data only, and the choice is the same for
+every request until the folder's images (or, for the daily strategy, the
+day) change. This keeps album pages cacheable. The rendered thumbnail tag of
+a folder's cover is memoized until then as well, so the cover image object
+is only loaded when the folder's images change.
+"""
+from datetime import date
+from hashlib import sha1
+
+from plone.memoize import ram
+
+STRATEGIES = ('daily', 'first', 'recent')
+
+
+def selectCover(images, folder_path, strategy='daily'):
+    """Return the cover image among ``images``, or None if there is none.
+
+    ``first`` picks the first image in catalog order, ``recent`` the most
+    recently modified image and ``daily`` an image picked by a seed built
+    from the folder path and the current day.
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError('Unknown cover strategy %r' % strategy)
+    if not images:
+        return None
+    if strategy == 'first':
+        return images[0]
+    if strategy == 'recent':
+        return max(images, key=lambda image: image.modified)
+    images = sorted(images, key=lambda image: image.getPath())
+    seed = sha1('%s:%s' % (folder_path, date.today().isoformat()))
+    return images[int(seed.hexdigest(), 16) % len(images)]
+
+
+def _coverTagKey(method, images, folder_path, strategy, title):
+    day = date.today().isoformat() if strategy == 'daily' else None
+    # the urls depend on virtual hosting, the modification dates change
+    # when an image is replaced
+    contents = [(image.getURL(), str(image.modified)) for image in images]
+    return (folder_path, strategy, day, title, contents)
+
+
+@ram.cache(_coverTagKey)
+def coverTag(images, folder_path, strategy, title):
+    """Return the thumbnail tag of the cover of a folder, or None.
+
+    Memoized per folder until the folder's images change.
+    """
+    cover = selectCover(images, folder_path, strategy)
+    if cover is None:
+        return None
+    scales = cover.getObject().restrictedTraverse('@@images')
+    scale = scales.scale('image', 'thumb')
+    if scale is None:
+        return None
+    return scale.tag(title=title)
@@ -0,0 +1,65 @@
+"""Report what plone.app.collection adds to the import time at startup.
+
+At Zope startup the ``<class>`` directive in ``configure.zcml`` imports the
+``collection`` module, which pulls in the rest of the package and its
+dependencies. This script imports what Plone loads anyway first, then times
+importing the ``collection`` module in the same fresh interpreter and lists
+the newly imported packages by number of modules. Processing the ZCML
+directives themselves is not included. Run it with an interpreter that has
+the instance eggs on its path, e.g.::
+
+  bin/zopepy -m plone.app.collection.importtime
+"""
+import subprocess
+import sys
+
+# Loaded by every Plone site, whether plone.app.collection is installed or not
+BASELINE = (
+    'Products.CMFPlone',
+    'Products.Archetypes.atapi',
+    'Products.ATContentTypes.content.document',
+)
+
+MEASURE = """
+import sys, time
+for name in %(baseline)r:
+    __import__(name)
+before = set(sys.modules)
+started = time.time()
+import plone.app.collection.collection
+print('%%f' %% (time.time() - started))
+new = set(name for name in sys.modules if sys.modules[name] is not None)
+for name in sorted(new - before):
+    print(name)
+"""
+
+
+def measure(repeat=3):
+    """Return the best import time and the modules newly imported."""
+    best = None
+    modules = []
+    for i in range(repeat):
+        output = subprocess.check_output(
+            [sys.executable, '-c', MEASURE % {'baseline': BASELINE}])
+        lines = output.split()
+        seconds = float(lines[0])
+        if best is None or seconds < best:
+            best = seconds
+            modules = lines[1:]
+    return best, modules
+
+
+def main():
+    seconds, modules = measure()
+    print('plone.app.collection.collection: %.1f ms, %d new modules' % (
+        seconds * 1000, len(modules)))
+    packages = {}
+    for name in modules:
+        package = '.'.join(name.split('.')[:3])
+        packages[package] = packages.get(package, 0) + 1
+    for package, count in sorted(packages.items(), key=lambda i: -i[1]):
+        print('  %-50s %4d modules' % (package, count))
+
+
+if __name__ == '__main__':
+    main()
@@ -2,8 +2,33 @@ try:
     from Products.CMFPlone.interfaces.syndication import ISyndicatable
 except ImportError:
     from zope.interface import Interface as ISyndicatable
+from zope.interface import Interface
 
 
 class ICollection(ISyndicatable):
     """ Collection marker interface
     """
+
+
+class IResultsStore(Interface):
+    """ Cross process store for collection results.
+
+    Register a utility providing this interface to share the results of
+    ``Collection.results()`` between users with the same visibility and
+    between ZEO clients.
+    """
+
+    def get(key):
+        """ Return a ``(counter, rids)`` tuple stored for ``key`` or None.
+
+        ``counter`` is the catalog counter the record ids were computed
+        against.
+        """
+
+    def set(key, counter, rids):
+        """ Store the catalog record ids ``rids`` for ``key``.
+        """
+
+    def clear():
+        """ Remove all stored results.
+        """
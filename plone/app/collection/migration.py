@@ -0,0 +1,393 @@
+"""Bulk migration of old style ATTopic objects to Collections.
+
+The migration walks the topics found in the catalog in batches, so only a
+bounded number of objects is ever loaded into the ZODB cache. Every batch is
+committed and the connection cache is garbage collected afterwards.
+Migrated topics disappear from the catalog, which means that an interrupted
+migration can simply be restarted and picks up where it stopped.
+"""
+from copy import deepcopy
+from time import time
+import logging
+
+from Acquisition import aq_base
+from Acquisition import aq_parent
+from Products.CMFCore.utils import getToolByName
+from Products.Five.browser import BrowserView
+from plone.protect import CheckAuthenticator
+from zope.annotation.interfaces import IAnnotations
+import transaction
+
+logger = logging.getLogger('plone.app.collection')
+
+# Fields which must not be copied from the topic to the new collection.
+SKIPPED_FIELDS = ('id', 'query', 'sort_on', 'sort_reversed', 'limit',
+                  'customViewFields')
+
+# Old topic display views mapped to their collection counterparts.
+LAYOUT_MAPPING = {
+    'atct_topic_view': 'standard_view',
+    'folder_listing': 'standard_view',
+    'folder_summary_view': 'summary_view',
+    'folder_tabular_view': 'tabular_view',
+    'folder_full_view': 'all_content',
+    'atct_album_view': 'thumbnail_view',
+    'folder_album_view': 'thumbnail_view',
+}
+
+OPERATION = 'plone.app.querystring.operation.%s'
+
+# Created inside the topic when syndication is enabled for it.
+SYNDICATION_ID = 'syndication_information'
+SYNDICATION_SETTINGS = ('syUpdatePeriod', 'syUpdateFrequency',
+                        'syUpdateBase', 'max_items')
+
+
+class TopicNotMigratable(Exception):
+    """The topic cannot be replaced by a collection without losing data."""
+
+
+def _string(criterion):
+    return [{'i': criterion.Field(),
+             'o': OPERATION % 'string.is',
+             'v': criterion.Value()}]
+
+
+def _selection(criterion):
+    values = list(criterion.Value())
+    # not every selection criterion has an operator
+    operator = getattr(criterion, 'getOperator', lambda: 'or')()
+    if operator == 'and' and len(values) > 1:
+        # plone.app.querystring only knows the 'or' operator for selections,
+        # which would return more results than the topic did.
+        return None
+    return [{'i': criterion.Field(),
+             'o': OPERATION % 'selection.is',
+             'v': values}]
+
+
+def _boolean(criterion):
+    if criterion.getBool():
+        operation = 'boolean.isTrue'
+    else:
+        operation = 'boolean.isFalse'
+    return [{'i': criterion.Field(), 'o': OPERATION % operation, 'v': ''}]
+
+
+def _path(criterion):
+    depth = '' if criterion.Recurse() else '::1'
+    return [{'i': 'path',
+             'o': OPERATION % 'string.path',
+             'v': uid + depth} for uid in criterion.getRawValue()]
+
+
+def _relative_path(criterion):
+    return [{'i': 'path',
+             'o': OPERATION % 'string.relativePath',
+             'v': criterion.getRelativePath()}]
+
+
+def _current_author(criterion):
+    return [{'i': criterion.Field(),
+             'o': OPERATION % 'string.currentUser',
+             'v': ''}]
+
+
+def _date_range(criterion):
+    return [{'i': criterion.Field(),
+             'o': OPERATION % 'date.between',
+             'v': [criterion.getStart(), criterion.getEnd()]}]
+
+
+def _friendly_date(criterion):
+    days = int(criterion.Value() or 0)
+    operation = criterion.getOperation()
+    if operation == 'within_day':
+        return [{'i': criterion.Field(),
+                 'o': OPERATION % 'date.today',
+                 'v': ''}]
+    if days == 0:
+        # "now": the date range does not matter
+        if operation == 'more':
+            name = 'date.afterToday'
+        else:
+            name = 'date.beforeToday'
+        return [{'i': criterion.Field(), 'o': OPERATION % name, 'v': ''}]
+    if criterion.getDateRange() == '-':
+        # "n days ago": the limits are mirrored into the past
+        days = -days
+        operation = 'less' if operation == 'more' else 'more'
+    if operation == 'more':
+        name = 'date.largerThanRelativeDate'
+    else:
+        name = 'date.lessThanRelativeDate'
+    return [{'i': criterion.Field(), 'o': OPERATION % name, 'v': days}]
+
+
+CRITERIA_CONVERTERS = {
+    'ATSimpleStringCriterion': _string,
+    'ATSelectionCriterion': _selection,
+    'ATListCriterion': _selection,
+    'ATPortalTypeCriterion': _selection,
+    'ATReferenceCriterion': _selection,
+    'ATBooleanCriterion': _boolean,
+    'ATPathCriterion': _path,
+    'ATRelativePathCriterion': _relative_path,
+    'ATCurrentAuthorCriterion': _current_author,
+    'ATDateRangeCriterion': _date_range,
+    'ATFriendlyDateCriteria': _friendly_date,
+}
+
+
+def convertCriteria(topic):
+    """Convert the criteria of a topic into the QueryField format.
+
+    Returns a tuple ``(query, sort_on, sort_reversed, unsupported)`` where
+    ``unsupported`` lists the meta types of criteria which could not be
+    converted, either because there is no converter for them or because the
+    converter returned None.
+    """
+    query = []
+    sort_on = None
+    sort_reversed = False
+    unsupported = []
+    for criterion in topic.listCriteria():
+        meta_type = criterion.meta_type
+        if meta_type == 'ATSortCriterion':
+            sort_on = criterion.Field()
+            sort_reversed = bool(criterion.getReversed())
+            continue
+        converter = CRITERIA_CONVERTERS.get(meta_type)
+        rows = None
+        if converter is not None:
+            rows = converter(criterion)
+        if rows is None:
+            unsupported.append(meta_type)
+            continue
+        query.extend(rows)
+    return query, sort_on, sort_reversed, unsupported
+
+
+def checkMigratable(topic):
+    """Raise ``TopicNotMigratable`` if replacing the topic would lose data.
+
+    Collections cannot contain sub-topics or other content, and cannot be
+    added inside a topic.
+    """
+    container = aq_parent(topic)
+    if getattr(aq_base(container), 'portal_type', None) == 'Topic':
+        raise TopicNotMigratable('topic is contained in topic %s' %
+                                 '/'.join(container.getPhysicalPath()))
+    criteria = set(criterion.getId() for criterion in topic.listCriteria())
+    criteria.add(SYNDICATION_ID)
+    contents = [id for id in topic.objectIds() if id not in criteria]
+    if contents:
+        raise TopicNotMigratable('topic contains %s' % ', '.join(contents))
+
+
+def _copyIdentity(topic, collection):
+    """Copy the owner, local roles and annotations of the topic."""
+    base = aq_base(topic)
+    owner = getattr(base, '_owner', None)
+    if owner is not None:
+        collection._owner = owner
+    local_roles = getattr(base, '__ac_local_roles__', None)
+    if local_roles is not None:
+        collection.__ac_local_roles__ = deepcopy(local_roles)
+    if getattr(base, '__ac_local_roles_block__', False):
+        collection.__ac_local_roles_block__ = True
+    annotations = getattr(base, '__annotations__', None)
+    if annotations:
+        # the topic is deleted, so its annotation values can be moved
+        target = IAnnotations(collection)
+        for key, value in annotations.items():
+            if key not in target:
+                target[key] = value
+
+
+def _copySyndication(topic, collection):
+    """Enable syndication for the collection if it is enabled for the topic.
+    """
+    information = getattr(aq_base(topic), SYNDICATION_ID, None)
+    if information is None:
+        return
+    syndication = getToolByName(collection, 'portal_syndication', None)
+    if syndication is None or not syndication.isSiteSyndicationAllowed():
+        return
+    syndication.enableSyndication(collection)
+    target = getattr(collection, SYNDICATION_ID)
+    for name in SYNDICATION_SETTINGS:
+        if hasattr(aq_base(information), name):
+            setattr(target, name, getattr(information, name))
+
+
+def migrateTopic(topic):
+    """Replace a single topic by a collection with the same id.
+
+    The collection keeps the UID, owner, local roles, annotations, the
+    syndication settings and the position in the container of the topic.
+
+    Returns the list of unsupported criteria found on the topic. Raises
+    ``TopicNotMigratable`` for topics containing sub-topics or other content.
+    """
+    checkMigratable(topic)
+    container = aq_parent(topic)
+    topic_id = topic.getId()
+    query, sort_on, sort_reversed, unsupported = convertCriteria(topic)
+
+    tmp_id = '%s_migrating_%s' % (topic_id, int(time()))
+    container.invokeFactory('Collection', tmp_id)
+    collection = container[tmp_id]
+
+    schema = collection.Schema()
+    for field in topic.Schema().fields():
+        name = field.getName()
+        if name in SKIPPED_FIELDS or name not in schema:
+            continue
+        schema[name].getMutator(collection)(deepcopy(field.getRaw(topic)))
+
+    collection.setQuery(query)
+    if sort_on:
+        collection.setSort_on(sort_on)
+        collection.setSort_reversed(sort_reversed)
+    if topic.getLimitNumber():
+        collection.setLimit(topic.getItemCount())
+    if topic.getCustomViewFields():
+        collection.setCustomViewFields(topic.getCustomViewFields())
+    layout = LAYOUT_MAPPING.get(topic.getLayout())
+    if layout is not None:
+        collection.setLayout(layout)
+
+    workflow_history = getattr(aq_base(topic), 'workflow_history', None)
+    if workflow_history is not None:
+        collection.workflow_history = deepcopy(workflow_history)
+        wf_tool = getToolByName(container, 'portal_workflow')
+        for workflow in wf_tool.getWorkflowsFor(collection):
+            workflow.updateRoleMappingsFor(collection)
+
+    _copyIdentity(topic, collection)
+    _copySyndication(topic, collection)
+
+    position = None
+    if getattr(aq_base(container), 'getObjectPosition', None) is not None:
+        position = container.getObjectPosition(topic_id)
+    uid = topic.UID()
+    container._delObject(topic_id)
+    container.manage_renameObject(tmp_id, topic_id)
+    collection = container[topic_id]
+    collection._setUID(uid)
+    if position is not None:
+        container.moveObjectToPosition(topic_id, position)
+    collection.reindexObject()
+    return unsupported
+
+
+def migrateTopics(portal, batch_size=100, max_objects=None, dry_run=False):
+    """Migrate all topics of a site in batches.
+
+    The topics are looked up once and migrated in batches of ``batch_size``,
+    each batch being committed (or aborted for a dry run). Every topic is
+    migrated within its own savepoint, which is rolled back if the topic
+    fails, so no half migrated topic is ever committed. After each batch
+    the ZODB cache is garbage collected, keeping memory usage bounded no
+    matter how many topics the site contains.
+
+    Topics which cannot be migrated without losing data are reported in
+    ``skipped``, topics failing with an error in ``failed``.
+
+    Returns a dictionary with the migration statistics.
+    """
+    catalog = getToolByName(portal, 'portal_catalog')
+    stats = {'migrated': 0, 'failed': [], 'skipped': {}, 'unsupported': {}}
+    started = time()
+    paths = [brain.getPath() for brain in catalog.unrestrictedSearchResults(
+        portal_type='Topic', sort_on='path')]
+    total = len(paths)
+    logger.info('Migrating %d topics to collections', total)
+
+    for start in range(0, total, batch_size):
+        if max_objects is not None and stats['migrated'] >= max_objects:
+            break
+        for path in paths[start:start + batch_size]:
+            if max_objects is not None and stats['migrated'] >= max_objects:
+                break
+            savepoint = transaction.savepoint()
+            try:
+                topic = portal.unrestrictedTraverse(path)
+                unsupported = migrateTopic(topic)
+            except TopicNotMigratable, e:
+                savepoint.rollback()
+                logger.warning('Skipped topic %s: %s', path, e)
+                stats['skipped'][path] = str(e)
+                continue
+            except Exception:
+                savepoint.rollback()
+                logger.exception('Could not migrate topic %s', path)
+                stats['failed'].append(path)
+                continue
+            if unsupported:
+                stats['unsupported'][path] = unsupported
+                logger.warning('Topic %s had unsupported criteria: %s',
+                               path, ', '.join(unsupported))
+            stats['migrated'] += 1
+        if dry_run:
+            transaction.abort()
+        else:
+            transaction.commit()
+        portal._p_jar.cacheGC()
+        elapsed = time() - started
+        logger.info('Migrated %d/%d topics (%d failed), %.1f topics/s',
+                    stats['migrated'], total, len(stats['failed']),
+                    stats['migrated'] / (elapsed or 1))
+
+    stats['seconds'] = time() - started
+    return stats
+
+
+class MigrateTopicsView(BrowserView):
+    """Run the topic migration through the web.
+
+    The form posts ``batch_size``, ``max_objects`` and ``dry_run``. The
+    statistics are reported as plain text.
+    """
+
+    errors = None
+
+    def __call__(self):
+        if self.request.get('REQUEST_METHOD') != 'POST':
+            return self.index()
+        CheckAuthenticator(self.request)
+        self.errors = {}
+        batch_size = self._positiveInt('batch_size', 100)
+        max_objects = self._positiveInt('max_objects', None)
+        if self.errors:
+            return self.index()
+        stats = migrateTopics(
+            self.context,
+            batch_size=batch_size,
+            max_objects=max_objects,
+            dry_run=bool(self.request.form.get('dry_run')))
+        self.request.response.setHeader('Content-Type', 'text/plain')
+        lines = ['Migrated %d topics in %.1f seconds.' % (
+            stats['migrated'], stats['seconds'])]
+        for path in stats['failed']:
+            lines.append('Failed: %s' % path)
+        for path, reason in sorted(stats['skipped'].items()):
+            lines.append('Skipped %s: %s' % (path, reason))
+        for path, criteria in sorted(stats['unsupported'].items()):
+            lines.append('Unsupported criteria in %s: %s' % (
+                path, ', '.join(criteria)))
+        return '\n'.join(lines)
+
+    def _positiveInt(self, name, default):
+        value = self.request.form.get(name)
+        if not value:
+            return default
+        try:
+            value = int(value)
+        except (TypeError, ValueError):
+            value = 0
+        if value < 1:
+            self.errors[name] = 'Please enter a positive number.'
+            return default
+        return value
@@ -0,0 +1,189 @@
+"""Opt-in profiling of the collection render path.
+
+A profile is recorded for a request when it carries the ``X-Collection-
+Profile`` header and the user may manage the portal, or when the rendered
+collection has been flagged for profiling on the ``@@collection-profiles``
+page. Profiles are kept in the
+request annotations while rendering and the last ``MAX_PROFILES`` finished
+profiles are kept in memory per process.
+
+Timed blocks record their own time only, excluding the blocks nested in
+them. Calls to ``getObject`` on catalog brains are counted and timed as a
+separate phase; to do so ``getObject`` is wrapped when the first profile is
+started. The remaining time of the request is recorded as ``render``.
+
+When profiling is not enabled the hooks only do a header and an attribute
+lookup, so the overhead is negligible.
+"""
+from collections import deque
+from time import time
+import threading
+
+from Acquisition import aq_base
+from Products.CMFCore.permissions import ManagePortal
+from Products.CMFCore.utils import _checkPermission
+from Products.ZCatalog.CatalogBrains import AbstractCatalogBrain
+from zope.annotation.interfaces import IAnnotations
+
+from plone.app.collection.interfaces import ICollection
+
+HEADER = 'HTTP_X_COLLECTION_PROFILE'
+PROFILE_KEY = 'plone.app.collection.profile'
+FLAG = '_profile_renders'
+MAX_PROFILES = 20
+
+PROFILES = deque(maxlen=MAX_PROFILES)
+
+# the profile recorded by the current thread, for counting getObject calls
+_active = threading.local()
+_getObject = None
+
+
+def _loads(context):
+    jar = getattr(context, '_p_jar', None)
+    if jar is None:
+        return 0
+    return jar.getTransferCounts()[0]
+
+
+class RenderProfile(object):
+    """Timings of a single collection render."""
+
+    def __init__(self, collection, url):
+        self.path = '/'.join(collection.getPhysicalPath())
+        self.url = url
+        self.started = time()
+        self.timings = []
+        self.total = None
+        self.loads = 0
+        self.getobject_calls = 0
+        self._getobject_seconds = 0
+        self._nested = []
+        self._jar_context = collection
+        self._loads_before = _loads(collection)
+
+    def record(self, name, seconds):
+        self.timings.append((name, seconds))
+
+    def start(self):
+        self._nested.append(0)
+
+    def stop(self, name, seconds):
+        """Record a timed block without the time of the blocks nested in it.
+        """
+        nested = self._nested.pop()
+        self._addNested(seconds)
+        self.record(name, seconds - nested)
+
+    def _addNested(self, seconds):
+        if self._nested:
+            self._nested[-1] += seconds
+
+    def countGetObject(self, seconds):
+        self.getobject_calls += 1
+        self._getobject_seconds += seconds
+        self._addNested(seconds)
+
+    def finish(self):
+        self.total = time() - self.started
+        # all ZODB loads, of content objects as well as catalog and PAS data
+        self.loads = _loads(self._jar_context) - self._loads_before
+        if self.getobject_calls:
+            self.record('getObject', self._getobject_seconds)
+        accounted = sum(seconds for name, seconds in self.timings)
+        self.record('render', max(self.total - accounted, 0))
+        self._jar_context = None
+
+
+class timer(object):
+    """Record the time spent in a block, if a profile is given."""
+
+    def __init__(self, profile, name):
+        self.profile = profile
+        self.name = name
+
+    def __enter__(self):
+        if self.profile is not None:
+            self.profile.start()
+        self.started = time()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.profile is not None:
+            self.profile.stop(self.name, time() - self.started)
+
+
+def _profiledGetObject(self, REQUEST=None):
+    profile = getattr(_active, 'profile', None)
+    if profile is None:
+        return _getObject(self, REQUEST)
+    started = time()
+    try:
+        return _getObject(self, REQUEST)
+    finally:
+        profile.countGetObject(time() - started)
+
+
+def _countGetObject():
+    """Wrap ``getObject`` of catalog brains to count the calls.
+
+    Done when the first profile is started, so sites which never profile do
+    not pay anything for it.
+    """
+    global _getObject
+    if _getObject is None:
+        _getObject = AbstractCatalogBrain.__dict__['getObject']
+        AbstractCatalogBrain.getObject = _profiledGetObject
+
+
+def getProfile(request):
+    """Return the profile being recorded for ``request`` or None."""
+    if request is None:
+        return None
+    return IAnnotations(request).get(PROFILE_KEY)
+
+
+def startProfile(collection, request):
+    """Start profiling ``request`` if a manager asks for it or if
+    ``collection`` is flagged, and return the profile (or None).
+    """
+    if request is None:
+        return None
+    if not getattr(aq_base(collection), FLAG, False):
+        # anybody can send the header, but only managers may profile
+        if not request.get(HEADER):
+            return None
+        if not _checkPermission(ManagePortal, collection):
+            return None
+    annotations = IAnnotations(request)
+    profile = annotations.get(PROFILE_KEY)
+    if profile is None:
+        profile = annotations[PROFILE_KEY] = RenderProfile(
+            collection, request.get('ACTUAL_URL', ''))
+        _countGetObject()
+        _active.profile = profile
+    return profile
+
+
+def setProfiling(collection, enabled):
+    """Flag or unflag a collection for profiling every render."""
+    if not ICollection.providedBy(collection):
+        raise ValueError('%r is not a collection' % collection)
+    if enabled:
+        setattr(collection, FLAG, True)
+    elif FLAG in aq_base(collection).__dict__:
+        delattr(collection, FLAG)
+
+
+def storeProfile(event):
+    """Finish the profile of a request and keep it.
+
+    Subscriber for the end of publishing.
+    """
+    profile = getProfile(event.request)
+    if profile is None:
+        return
+    del IAnnotations(event.request)[PROFILE_KEY]
+    _active.profile = None
+    profile.finish()
+    PROFILES.appendleft(profile)
@@ -0,0 +1,290 @@
+"""Sharing collection results between users and ZEO clients.
+
+Only the catalog record ids of a result set are stored, together with the
+catalog counter they were computed against. A stored result is used as long
+as the catalog did not change since, so every client in a cluster can serve
+a hot collection from the store instead of querying the catalog again.
+
+Anonymous users all share the same results. Authenticated users share the
+results with every user whose principals grant the same visibility: only the
+principals that appear in the ``allowedRolesAndUsers`` index values of the
+candidate results are taken into account for the key.
+
+Caching is disabled unless a utility providing ``IResultsStore`` is
+registered, e.g. in the ``site.zcml`` of the instance::
+
+  <utility factory="plone.app.collection.resultscache.FileResultsStore" />
+
+The file store needs the ``PLONE_COLLECTION_RESULTS_DIR`` environment
+variable to point to a directory shared only by the clients of one database.
+Putting it on ``/dev/shm`` turns it into a shared memory store.
+"""
+from array import array
+from hashlib import sha1
+from time import time
+import errno
+import marshal
+import os
+import tempfile
+
+from AccessControl import getSecurityManager
+from BTrees.IIBTree import IITreeSet
+from BTrees.IIBTree import intersection
+from Products.CMFCore.permissions import AccessInactivePortalContent
+from Products.CMFCore.utils import _checkPermission
+from Products.CMFCore.utils import getToolByName
+from Products.ZCatalog.Lazy import LazyCat
+from Products.ZCatalog.Lazy import LazyMap
+from plone.app.contentlisting.interfaces import IContentListing
+from plone.app.querystring import queryparser
+from plone.memoize import ram
+from zope.component import queryUtility
+from zope.interface import implements
+
+from plone.app.collection.interfaces import IResultsStore
+from plone.app.collection.profiling import timer
+
+try:
+    from plone.batching import Batch
+except ImportError:
+    from Products.CMFPlone.PloneBatch import Batch
+
+
+class FileResultsStore(object):
+    """Store results as one small file per key in a directory.
+
+    Clients sharing the directory share the results. Entries older than
+    ``max_age`` seconds are ignored, so time dependent queries (e.g. on
+    effective dates) are recomputed regularly even if the catalog does not
+    change. Expired entries are removed when they are read, and every
+    ``max_age`` seconds storing an entry sweeps the whole directory, so it
+    does not grow without bounds.
+    """
+    implements(IResultsStore)
+
+    _swept = 0
+
+    def __init__(self, directory=None, max_age=300):
+        # There is no default directory: clients of different databases
+        # must never share one.
+        directory = directory or os.environ.get('PLONE_COLLECTION_RESULTS_DIR')
+        if not directory:
+            raise ValueError('FileResultsStore needs a directory or the '
+                             'PLONE_COLLECTION_RESULTS_DIR environment '
+                             'variable.')
+        self.directory = directory
+        self.max_age = max_age
+        try:
+            os.makedirs(self.directory)
+        except OSError, e:
+            # another client may have created it at the same time
+            if e.errno != errno.EEXIST:
+                raise
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.rids')
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            # another client removed it already
+            pass
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            if time() - os.path.getmtime(path) > self.max_age:
+                self._remove(path)
+                return None
+            with open(path, 'rb') as f:
+                counter, data = marshal.load(f)
+        except (IOError, OSError, EOFError, ValueError, TypeError):
+            return None
+        rids = array('i')
+        rids.fromstring(data)
+        return counter, rids
+
+    def set(self, key, counter, rids):
+        data = marshal.dumps((counter, array('i', rids).tostring()))
+        fd, tmp = tempfile.mkstemp(dir=self.directory)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            # rename is atomic, readers never see a partially written file
+            os.rename(tmp, self._path(key))
+        except (IOError, OSError):
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        if time() - self._swept > self.max_age:
+            self.sweep()
+
+    def sweep(self):
+        """Remove the expired entries, and files left by failed writes."""
+        self._swept = now = time()
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                expired = now - os.path.getmtime(path) > self.max_age
+            except OSError:
+                continue
+            if expired:
+                self._remove(path)
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            if name.endswith('.rids'):
+                os.remove(os.path.join(self.directory, name))
+
+
+def _databaseName(context):
+    jar = getattr(context, '_p_jar', None)
+    if jar is None:
+        return None
+    db = jar.db()
+    return (db.database_name, db.storage.getName())
+
+
+def cacheKey(collection, sort_on, custom_query):
+    """Build the store key for the results of a collection for anonymous.
+
+    The key contains the database, the site and the request language, as
+    multilingual add-ons filter catalog searches by language.
+    """
+    portal = getToolByName(collection, 'portal_url').getPortalObject()
+    parts = (
+        _databaseName(collection),
+        '/'.join(portal.getPhysicalPath()),
+        collection.REQUEST.get('LANGUAGE'),
+        '/'.join(collection.getPhysicalPath()),
+        collection.getRawQuery(),
+        sort_on,
+        collection.getSort_reversed(),
+        collection.getLimit(),
+        sorted(custom_query.items()),
+    )
+    return sha1(repr(parts)).hexdigest()
+
+
+def _dependsOnUser(collection):
+    for row in collection.getRawQuery():
+        if row.get('o', '').endswith('.currentUser'):
+            return True
+    return False
+
+
+def _relevantPrincipalsKey(method, catalog, collection, custom_query, key,
+                           counter):
+    if _dependsOnUser(collection):
+        # the candidates are parsed for the current user
+        return (key, counter, getSecurityManager().getUser().getId())
+    return (key, counter)
+
+
+@ram.cache(_relevantPrincipalsKey)
+def relevantPrincipals(catalog, collection, custom_query, key, counter):
+    """Return the principals which grant access to any candidate result.
+
+    The candidates are searched without security and date restrictions, so
+    they are a superset of what any user can see. Only record id sets are
+    intersected with the ``allowedRolesAndUsers`` index, no brains are
+    created.
+    """
+    index = catalog._catalog.getIndex('allowedRolesAndUsers')
+    query = queryparser.parseFormquery(collection, collection.getRawQuery())
+    query.update(custom_query)
+    if not query:
+        # every cataloged object is a candidate
+        return frozenset(index.uniqueValues())
+    candidates = IITreeSet(resultRids(catalog._catalog.search(query)))
+    principals = set()
+    for principal in index.uniqueValues():
+        rids = index._index.get(principal)
+        if isinstance(rids, int):
+            # keyword indexes store a single record id unwrapped
+            if rids in candidates:
+                principals.add(principal)
+        elif rids is not None and intersection(rids, candidates):
+            principals.add(principal)
+    return frozenset(principals)
+
+
+def principalsKey(catalog, collection, custom_query, key, counter):
+    """Build the store key for the results of the current user.
+
+    Users whose principals intersect the relevant principals of the results
+    identically see the same results and share the key.
+    """
+    user = getSecurityManager().getUser()
+    relevant = relevantPrincipals(catalog, collection, custom_query, key,
+                                  counter)
+    principals = relevant.intersection(
+        catalog._listAllowedRolesAndUsers(user))
+    parts = [key, sorted(principals),
+             bool(_checkPermission(AccessInactivePortalContent, catalog))]
+    if _dependsOnUser(collection):
+        # the results depend on the user itself
+        parts.append(user.getId())
+    return sha1(repr(parts)).hexdigest()
+
+
+def resultRids(results):
+    """Return the record ids of catalog results.
+
+    The record ids are taken from the sequences underlying the lazy results
+    where possible, so no brains are created.
+    """
+    if isinstance(results, LazyCat):
+        rids = []
+        for sequence in results._seq:
+            rids.extend(resultRids(sequence))
+        return rids
+    if (isinstance(results, LazyMap) and
+            getattr(results._func, '__name__', None) == '__getitem__'):
+        rids = list(results._seq)
+        if all(isinstance(rid, int) for rid in rids):
+            return rids
+    return [brain.getRID() for brain in results]
+
+
+def cachedResults(collection, sort_on, custom_query, profile=None):
+    """Return the unbatched brains of the request, using the store.
+
+    Returns None when results cannot be shared, i.e. when no store is
+    registered or the catalog does not provide a change counter. The time
+    spent on the store is recorded in ``profile``, if given.
+    """
+    store = queryUtility(IResultsStore)
+    if store is None:
+        return None
+    catalog = getToolByName(collection, 'portal_catalog')
+    getCounter = getattr(catalog, 'getCounter', None)
+    if getCounter is None:
+        return None
+
+    with timer(profile, 'results store'):
+        counter = getCounter()
+        key = cacheKey(collection, sort_on, custom_query)
+        membership = getToolByName(collection, 'portal_membership')
+        if not membership.isAnonymousUser():
+            key = principalsKey(catalog, collection, custom_query, key,
+                                counter)
+        cached = store.get(key)
+        if cached is not None and cached[0] == counter:
+            rids = cached[1]
+        else:
+            results = collection.getQuery(batch=False, sort_on=sort_on,
+                                          brains=True,
+                                          custom_query=custom_query)
+            rids = resultRids(results)
+            store.set(key, counter, rids)
+    return LazyMap(catalog._catalog.__getitem__, rids, len(rids))
+
+
+def wrapResults(results, batch=True, b_start=0, b_size=30, brains=False):
+    """Wrap brains the same way the query builder does."""
+    if not brains:
+        results = IContentListing(results)
+    if batch:
+        results = Batch(results, b_size, start=b_start)
+    return results
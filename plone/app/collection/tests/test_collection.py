@@ -1,4 +1,5 @@
 from Products.CMFCore.utils import getToolByName
+from plone.app.collection.covers import coverTag
 from plone.app.collection.testing import PLONEAPPCOLLECTION_INTEGRATION_TESTING
 from plone.app.testing import TEST_USER_ID
 from plone.app.testing import TEST_USER_NAME
@@ -8,6 +9,7 @@ from plone.app.testing import setRoles
 from plone.testing.z2 import Browser
 from transaction import commit
 
+import json
 import unittest2 as unittest
 
 
@@ -27,6 +29,35 @@ def getData(filename):
     return data
 
 
+class DummyImage(object):
+    """Catalog result for an image, counting the object loads."""
+
+    modified = '2013/01/01'
+    loads = 0
+
+    def __init__(self, path):
+        self.path = path
+
+    def getPath(self):
+        return self.path
+
+    def getURL(self):
+        return 'http://nohost' + self.path
+
+    def getObject(self):
+        DummyImage.loads += 1
+        return self
+
+    def restrictedTraverse(self, name):
+        return self
+
+    def scale(self, fieldname, scale):
+        return self
+
+    def tag(self, title):
+        return '<img src="%s" title="%s" />' % (self.getURL(), title)
+
+
 class TestCollection(unittest.TestCase):
 
     layer = PLONEAPPCOLLECTION_INTEGRATION_TESTING
@@ -145,6 +176,61 @@ class TestCollection(unittest.TestCase):
         browser.open('%s/thumbnail_view' % self.collection.absolute_url())
         self.assertTrue("Image example" in browser.contents)
 
+    def test_event_dates_localized_timezone(self):
+        from DateTime import DateTime
+        view = self.collection.restrictedTraverse('@@collection_event_dates')
+        local = DateTime('2014/10/23 10:00 GMT+2')
+        utc = local.toZone('UTC')
+        self.assertEqual(local.timeTime(), utc.timeTime())
+        self.assertNotEqual(view.localized(local, time_only=True),
+                            view.localized(utc, time_only=True))
+
+    def test_streaming_view_selectable(self):
+        layouts = [id for id, title in self.collection.getAvailableLayouts()]
+        self.assertTrue('streaming_view' in layouts)
+
+    def test_streaming_view(self):
+        for i in range(3):
+            self.portal.invokeFactory('Document',
+                                      'doc%d' % i,
+                                      title='Collection Test Page')
+        self.collection.setQuery(query)
+        commit()
+        logout()
+        browser = Browser(self.layer['app'])
+        browser.handleErrors = False
+        url = self.collection.absolute_url()
+        browser.open('%s/streaming_view?listing=summary_view' % url)
+        self.assertEqual(browser.contents.count('tileHeadline'), 3)
+        self.assertTrue('collection-stream' in browser.contents)
+        browser.open('%s/listing_batch?b_size=2' % url)
+        data = json.loads(browser.contents)
+        self.assertEqual(data['total'], 3)
+        self.assertEqual(len(data['items']), 2)
+        self.assertTrue('Collection Test Page' in data['html'])
+        browser.open(data['next'])
+        data = json.loads(browser.contents)
+        self.assertEqual(len(data['items']), 1)
+        self.assertEqual(data['next'], None)
+
+    def test_listing_batch_parameters(self):
+        for i in range(3):
+            self.portal.invokeFactory('Document',
+                                      'doc%d' % i,
+                                      title='Collection Test Page')
+        self.collection.setQuery(query)
+        self.collection.setLimit(2)
+        request = self.layer['request']
+        view = self.collection.restrictedTraverse('@@listing_batch')
+        request.form.update({'b_start': 'x', 'b_size': 'all'})
+        data = json.loads(view())
+        self.assertEqual(data['b_start'], 0)
+        self.assertEqual(data['b_size'], 2)
+        request.form.update({'b_start': '-5', 'b_size': '100000'})
+        data = json.loads(view())
+        self.assertEqual(data['b_start'], 0)
+        self.assertEqual(len(data['items']), 2)
+
     def test_getFoldersAndImages(self):
         collection = self.collection
 
@@ -203,6 +289,52 @@ class TestCollection(unittest.TestCase):
         imagecount = collection.getFoldersAndImages()['total_number_of_images']
         self.assertEqual(imagecount, 3)
 
+    def test_getFoldersAndImages_covers(self):
+        collection = self.collection
+        self.portal.invokeFactory("Folder",
+                                  "folder1",
+                                  title="Folder1")
+        folder = self.portal['folder1']
+        folder.invokeFactory("Image",
+                             "image1",
+                             title="Image example")
+        folder.invokeFactory("Image",
+                             "image2",
+                             title="Image example")
+        query = [{
+            'i': 'Type',
+            'o': 'plone.app.querystring.operation.string.is',
+            'v': 'Folder',
+        }]
+        collection.setQuery(query)
+        folder_path = '/'.join(folder.getPhysicalPath())
+        cover = collection.getFoldersAndImages()['covers'][folder_path]
+        # the same cover is chosen on every request
+        for i in range(3):
+            data = collection.getFoldersAndImages()
+            self.assertEqual(data['covers'][folder_path].getPath(),
+                             cover.getPath())
+        recent = collection.getFoldersAndImages(cover='recent')
+        self.assertEqual(recent['covers'][folder_path].getId(), 'image2')
+        collection.setCover_strategy('first')
+        first = collection.getFoldersAndImages()
+        self.assertEqual(first['covers'][folder_path].getId(), 'image1')
+        self.assertRaises(ValueError, collection.getFoldersAndImages,
+                          cover='random')
+
+    def test_coverTag_is_memoized(self):
+        images = [DummyImage('/plone/a/image%d' % i) for i in range(2)]
+        tag = coverTag(images, '/plone/a', 'first', 'Album')
+        self.assertEqual(
+            tag, '<img src="http://nohost/plone/a/image0" title="Album" />')
+        loads = DummyImage.loads
+        coverTag(images, '/plone/a', 'first', 'Album')
+        self.assertEqual(DummyImage.loads, loads)
+        # a change of the folder's images picks the cover again
+        images.insert(0, DummyImage('/plone/a/image'))
+        coverTag(images, '/plone/a', 'first', 'Album')
+        self.assertEqual(DummyImage.loads, loads + 1)
+
     def test_limit(self):
         collection = self.collection
 
@@ -235,3 +367,20 @@ class TestCollection(unittest.TestCase):
     def test_syndication_enabled_by_default(self):
         syn = getToolByName(self.portal, 'portal_syndication')
         self.assertTrue(syn.isSyndicationAllowed(self.collection))
+
+    def test_event_dates(self):
+        from DateTime import DateTime
+        start = DateTime('2014/10/23 10:00')
+        self.portal.invokeFactory('Event',
+                                  'event1',
+                                  title='Collection Test Page',
+                                  startDate=start,
+                                  endDate=start + 1.0 / 24)
+        self.collection.setQuery(query)
+        view = self.collection.restrictedTraverse('@@collection_event_dates')
+        dates = view.dates(self.collection.results())
+        event = dates['/'.join(self.portal.event1.getPhysicalPath())]
+        self.assertTrue(event['samedate'])
+        self.assertFalse(event['sametime'])
+        self.assertEqual(event['start_time'],
+                         view.localized(start, time_only=True))
@@ -0,0 +1,265 @@
+from plone.app.collection import migration
+from plone.app.collection.migration import convertCriteria
+from plone.app.collection.migration import migrateTopic
+from plone.app.collection.migration import migrateTopics
+from plone.app.collection.testing import PLONEAPPCOLLECTION_FUNCTIONAL_TESTING
+from plone.app.collection.testing import PLONEAPPCOLLECTION_INTEGRATION_TESTING
+from plone.app.testing import TEST_USER_ID
+from plone.app.testing import TEST_USER_NAME
+from plone.app.testing import login
+from plone.app.testing import setRoles
+from plone.protect.authenticator import createToken
+from zExceptions import Forbidden
+from zope.component import getMultiAdapter
+from zope.annotation.interfaces import IAnnotations
+
+import transaction
+import unittest2 as unittest
+
+
+class BrokenLayouts(dict):
+    """Layout mapping failing for topics with the ``broken_view`` layout."""
+
+    def get(self, key, default=None):
+        if key == 'broken_view':
+            raise ValueError('broken layout')
+        return dict.get(self, key, default)
+
+
+class TestTopicMigration(unittest.TestCase):
+
+    layer = PLONEAPPCOLLECTION_INTEGRATION_TESTING
+
+    def setUp(self):
+        self.portal = self.layer['portal']
+        setRoles(self.portal, TEST_USER_ID, ['Manager'])
+        login(self.portal, TEST_USER_NAME)
+        self.portal.invokeFactory('Topic', 'topic', title='Old Topic')
+        self.topic = self.portal['topic']
+        criterion = self.topic.addCriterion(
+            'Title', 'ATSimpleStringCriterion')
+        criterion.setValue('Collection Test Page')
+        sort = self.topic.addCriterion('created', 'ATSortCriterion')
+        sort.setReversed(True)
+
+    def test_convertCriteria(self):
+        query, sort_on, sort_reversed, unsupported = convertCriteria(
+            self.topic)
+        self.assertEqual(query, [{
+            'i': 'Title',
+            'o': 'plone.app.querystring.operation.string.is',
+            'v': 'Collection Test Page',
+        }])
+        self.assertEqual(sort_on, 'created')
+        self.assertTrue(sort_reversed)
+        self.assertEqual(unsupported, [])
+
+    def _convert(self, field, meta_type, **values):
+        topic_id = 'criteria_%s' % meta_type.lower()
+        self.portal.invokeFactory('Topic', topic_id)
+        topic = self.portal[topic_id]
+        criterion = topic.addCriterion(field, meta_type)
+        for name, value in values.items():
+            criterion.getField(name).set(criterion, value)
+        query, sort_on, sort_reversed, unsupported = convertCriteria(topic)
+        self.portal.manage_delObjects([topic_id])
+        return query, unsupported
+
+    def test_convert_friendly_date_after_now(self):
+        query, unsupported = self._convert(
+            'start', 'ATFriendlyDateCriteria',
+            value=0, operation='more', dateRange='+')
+        self.assertEqual(query, [{
+            'i': 'start',
+            'o': 'plone.app.querystring.operation.date.afterToday',
+            'v': '',
+        }])
+
+    def test_convert_friendly_date_before_now(self):
+        query, unsupported = self._convert(
+            'start', 'ATFriendlyDateCriteria',
+            value=0, operation='less', dateRange='-')
+        self.assertEqual(query[0]['o'],
+                         'plone.app.querystring.operation.date.beforeToday')
+
+    def test_convert_friendly_date_within_day(self):
+        query, unsupported = self._convert(
+            'start', 'ATFriendlyDateCriteria',
+            value=0, operation='within_day', dateRange='+')
+        self.assertEqual(query[0]['o'],
+                         'plone.app.querystring.operation.date.today')
+
+    def test_convert_friendly_date_days_ago(self):
+        query, unsupported = self._convert(
+            'created', 'ATFriendlyDateCriteria',
+            value=5, operation='more', dateRange='-')
+        self.assertEqual(query, [{
+            'i': 'created',
+            'o': 'plone.app.querystring.operation.date.lessThanRelativeDate',
+            'v': -5,
+        }])
+
+    def test_convert_selection_or(self):
+        query, unsupported = self._convert(
+            'Subject', 'ATSelectionCriterion',
+            value=('foo', 'bar'), operator='or')
+        self.assertEqual(query, [{
+            'i': 'Subject',
+            'o': 'plone.app.querystring.operation.selection.is',
+            'v': ['foo', 'bar'],
+        }])
+        self.assertEqual(unsupported, [])
+
+    def test_convert_selection_and_is_unsupported(self):
+        query, unsupported = self._convert(
+            'Subject', 'ATSelectionCriterion',
+            value=('foo', 'bar'), operator='and')
+        self.assertEqual(query, [])
+        self.assertEqual(unsupported, ['ATSelectionCriterion'])
+
+    def test_migrateTopic_replaces_topic(self):
+        self.portal.invokeFactory('Document',
+                                  'doc1',
+                                  title='Collection Test Page')
+        migrateTopic(self.topic)
+        collection = self.portal['topic']
+        self.assertEqual(collection.portal_type, 'Collection')
+        self.assertEqual(collection.Title(), 'Old Topic')
+        self.assertEqual(collection.getSort_on(), 'created')
+        self.assertEqual(
+            collection.results()[0].Title(), 'Collection Test Page')
+
+
+    def test_migrateTopic_keeps_uid(self):
+        uid = self.topic.UID()
+        migrateTopic(self.topic)
+        self.assertEqual(self.portal['topic'].UID(), uid)
+        catalog = self.portal.portal_catalog
+        brains = catalog(UID=uid)
+        self.assertEqual(len(brains), 1)
+        self.assertEqual(brains[0].portal_type, 'Collection')
+
+    def test_migrateTopic_keeps_local_roles(self):
+        self.topic.manage_setLocalRoles('editor', ['Editor'])
+        self.topic.__ac_local_roles_block__ = True
+        migrateTopic(self.topic)
+        collection = self.portal['topic']
+        self.assertIn('Editor',
+                      collection.get_local_roles_for_userid('editor'))
+        self.assertTrue(collection.__ac_local_roles_block__)
+
+    def test_migrateTopic_keeps_owner(self):
+        self.portal.acl_users.userFolderAddUser(
+            'owner', 'secret', ['Member'], [])
+        self.topic.changeOwnership(
+            self.portal.acl_users.getUserById('owner'))
+        migrateTopic(self.topic)
+        self.assertEqual(self.portal['topic'].getOwner().getId(), 'owner')
+
+    def test_migrateTopic_keeps_annotations(self):
+        IAnnotations(self.topic)['plone.app.collection.tests'] = 'value'
+        migrateTopic(self.topic)
+        self.assertEqual(
+            IAnnotations(self.portal['topic'])['plone.app.collection.tests'],
+            'value')
+
+    def test_migrateTopic_keeps_syndication(self):
+        syndication = self.portal.portal_syndication
+        syndication.isAllowed = True
+        syndication.enableSyndication(self.topic)
+        self.topic.syndication_information.max_items = 5
+        migrateTopic(self.topic)
+        collection = self.portal['topic']
+        self.assertEqual(collection.portal_type, 'Collection')
+        self.assertEqual(collection.syndication_information.max_items, 5)
+
+    def test_migrateTopic_keeps_position(self):
+        self.portal.invokeFactory('Document', 'after')
+        position = self.portal.getObjectPosition('topic')
+        migrateTopic(self.topic)
+        self.assertEqual(self.portal.getObjectPosition('topic'), position)
+        self.assertEqual(self.portal.getObjectPosition('after'), position + 1)
+
+
+    def _migrateView(self, **form):
+        request = self.layer['request']
+        request['REQUEST_METHOD'] = 'POST'
+        request.form.update(form)
+        return getMultiAdapter((self.portal, request), name='migrate-topics')
+
+    def test_view_requires_authenticator(self):
+        view = self._migrateView()
+        self.assertRaises(Forbidden, view)
+        self.assertEqual(self.portal['topic'].portal_type, 'Topic')
+
+    def test_view_validates_numbers(self):
+        view = self._migrateView(_authenticator=createToken(),
+                                 batch_size='many', max_objects='-1')
+        view()
+        self.assertEqual(sorted(view.errors), ['batch_size', 'max_objects'])
+        self.assertEqual(self.portal['topic'].portal_type, 'Topic')
+
+
+class TestTopicsMigration(unittest.TestCase):
+
+    layer = PLONEAPPCOLLECTION_FUNCTIONAL_TESTING
+
+    def setUp(self):
+        self.portal = self.layer['portal']
+        setRoles(self.portal, TEST_USER_ID, ['Manager'])
+        login(self.portal, TEST_USER_NAME)
+        for i in range(3):
+            self.portal.invokeFactory('Topic', 'topic%d' % i)
+        transaction.commit()
+        self._layouts = migration.LAYOUT_MAPPING
+
+    def tearDown(self):
+        migration.LAYOUT_MAPPING = self._layouts
+
+    def assertTypes(self, portal_type, ids):
+        for id in ids:
+            self.assertEqual(self.portal[id].portal_type, portal_type)
+
+    def test_batches_are_committed(self):
+        stats = migrateTopics(self.portal, batch_size=2)
+        self.assertEqual(stats['migrated'], 3)
+        self.assertEqual(stats['failed'], [])
+        transaction.abort()
+        self.assertTypes('Collection', ['topic0', 'topic1', 'topic2'])
+
+    def test_resume(self):
+        stats = migrateTopics(self.portal, batch_size=2, max_objects=1)
+        self.assertEqual(stats['migrated'], 1)
+        transaction.abort()
+        self.assertTypes('Collection', ['topic0'])
+        self.assertTypes('Topic', ['topic1', 'topic2'])
+        # a second run picks up the remaining topics
+        stats = migrateTopics(self.portal, batch_size=2)
+        self.assertEqual(stats['migrated'], 2)
+        transaction.abort()
+        self.assertTypes('Collection', ['topic0', 'topic1', 'topic2'])
+
+    def test_failed_topic_is_rolled_back(self):
+        self.portal['topic1'].setLayout('broken_view')
+        transaction.commit()
+        migration.LAYOUT_MAPPING = BrokenLayouts(self._layouts)
+        stats = migrateTopics(self.portal, batch_size=2)
+        self.assertEqual(stats['migrated'], 2)
+        topic1_path = '/'.join(self.portal['topic1'].getPhysicalPath())
+        self.assertEqual(stats['failed'], [topic1_path])
+        transaction.abort()
+        self.assertTypes('Collection', ['topic0', 'topic2'])
+        self.assertTypes('Topic', ['topic1'])
+        self.assertEqual(
+            [id for id in self.portal.objectIds() if '_migrating_' in id], [])
+
+    def test_sub_topics_are_skipped(self):
+        self.portal['topic0'].invokeFactory('Topic', 'subtopic')
+        transaction.commit()
+        stats = migrateTopics(self.portal)
+        self.assertEqual(stats['migrated'], 2)
+        self.assertEqual(len(stats['skipped']), 2)
+        transaction.abort()
+        self.assertTypes('Topic', ['topic0'])
+        self.assertEqual(
+            self.portal['topic0']['subtopic'].portal_type, 'Topic')
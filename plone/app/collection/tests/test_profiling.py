@@ -0,0 +1,135 @@
+from plone.app.collection import profiling
+from plone.app.collection.interfaces import IResultsStore
+from plone.app.collection.resultscache import FileResultsStore
+from plone.app.collection.testing import PLONEAPPCOLLECTION_INTEGRATION_TESTING
+from plone.app.testing import TEST_USER_ID
+from plone.app.testing import TEST_USER_NAME
+from plone.app.testing import login
+from plone.app.testing import setRoles
+
+from zope.component import getGlobalSiteManager
+from zope.component import getMultiAdapter
+
+import shutil
+import tempfile
+import unittest2 as unittest
+
+
+class DummyEvent(object):
+
+    def __init__(self, request):
+        self.request = request
+
+
+class TestProfiling(unittest.TestCase):
+
+    layer = PLONEAPPCOLLECTION_INTEGRATION_TESTING
+
+    def setUp(self):
+        self.portal = self.layer['portal']
+        self.request = self.layer['request']
+        setRoles(self.portal, TEST_USER_ID, ['Manager'])
+        login(self.portal, TEST_USER_NAME)
+        self.portal.invokeFactory('Collection', 'col')
+        self.collection = self.portal['col']
+        self.collection.setQuery([{
+            'i': 'portal_type',
+            'o': 'plone.app.querystring.operation.selection.is',
+            'v': ['Folder'],
+        }])
+        profiling.PROFILES.clear()
+
+    def test_disabled_by_default(self):
+        self.collection.results()
+        self.assertEqual(profiling.getProfile(self.request), None)
+        profiling.storeProfile(DummyEvent(self.request))
+        self.assertEqual(len(profiling.PROFILES), 0)
+
+    def test_header_ignored_for_non_managers(self):
+        setRoles(self.portal, TEST_USER_ID, ['Member'])
+        self.request.environ[profiling.HEADER] = '1'
+        self.collection.results()
+        self.assertEqual(profiling.getProfile(self.request), None)
+
+    def test_header(self):
+        self.request.environ[profiling.HEADER] = '1'
+        self.collection.results()
+        profiling.storeProfile(DummyEvent(self.request))
+        self.assertEqual(len(profiling.PROFILES), 1)
+        names = [name for name, seconds in profiling.PROFILES[0].timings]
+        self.assertEqual(names, ['query compile', 'catalog search',
+                                 'batch creation', 'render'])
+        self.assertEqual(profiling.getProfile(self.request), None)
+
+    def test_collection_flag(self):
+        profiling.setProfiling(self.collection, True)
+        self.collection.results()
+        self.assertNotEqual(profiling.getProfile(self.request), None)
+        profiling.setProfiling(self.collection, False)
+        self.assertFalse(hasattr(self.collection.aq_base,
+                                 profiling.FLAG))
+
+    def test_flag_only_collections(self):
+        self.assertRaises(ValueError, profiling.setProfiling,
+                          self.portal, True)
+
+    def _profile(self, **kwargs):
+        self.request.environ[profiling.HEADER] = '1'
+        results = self.collection.results(**kwargs)
+        return results, profiling.getProfile(self.request)
+
+    def _store(self, profile):
+        profiling.storeProfile(DummyEvent(self.request))
+        return [name for name, seconds in profile.timings]
+
+    def test_nested_timings_are_exclusive(self):
+        profile = profiling.RenderProfile(self.collection, '')
+        profile.start()
+        profile.start()
+        profile.countGetObject(0.5)
+        profile.stop('inner', 2.0)
+        profile.stop('outer', 3.0)
+        profile.finish()
+        timings = dict(profile.timings)
+        self.assertEqual(timings['inner'], 1.5)
+        self.assertEqual(timings['outer'], 1.0)
+        self.assertEqual(timings['getObject'], 0.5)
+
+    def test_getObject_calls(self):
+        self.portal.invokeFactory('Folder', 'folder1')
+        self.portal.invokeFactory('Folder', 'folder2')
+        results, profile = self._profile()
+        for item in results:
+            item.getObject()
+        names = self._store(profile)
+        self.assertEqual(profile.getobject_calls, 2)
+        self.assertIn('getObject', names)
+        # without profile the calls are not counted any more
+        del self.request.environ[profiling.HEADER]
+        for item in self.collection.results():
+            item.getObject()
+        self.assertEqual(profile.getobject_calls, 2)
+
+    def test_listing_timer(self):
+        results, profile = self._profile()
+        view = getMultiAdapter((self.collection, self.request),
+                               name='collection_profile_timer')
+        view.start('listing entries')
+        view.stop()
+        self.assertIn('listing entries', self._store(profile))
+
+    def test_results_store(self):
+        directory = tempfile.mkdtemp()
+        store = FileResultsStore(directory)
+        getGlobalSiteManager().registerUtility(store, IResultsStore)
+        try:
+            results, profile = self._profile()
+            self.assertEqual(self._store(profile),
+                             ['query compile', 'catalog search',
+                              'results store', 'batch creation', 'render'])
+            results, profile = self._profile()
+            self.assertEqual(self._store(profile),
+                             ['results store', 'batch creation', 'render'])
+        finally:
+            getGlobalSiteManager().unregisterUtility(store, IResultsStore)
+            shutil.rmtree(directory)
@@ -0,0 +1,145 @@
+from plone.app.collection.interfaces import IResultsStore
+from plone.app.collection.resultscache import FileResultsStore
+from plone.app.collection.resultscache import cacheKey
+from plone.app.collection.resultscache import resultRids
+from plone.app.collection.testing import PLONEAPPCOLLECTION_INTEGRATION_TESTING
+from plone.app.testing import TEST_USER_ID
+from plone.app.testing import TEST_USER_NAME
+from plone.app.testing import login
+from plone.app.testing import logout
+from plone.app.testing import setRoles
+from time import time
+from zope.component import getGlobalSiteManager
+
+import os
+import shutil
+import tempfile
+import unittest2 as unittest
+
+
+query = [{
+    'i': 'Title',
+    'o': 'plone.app.querystring.operation.string.is',
+    'v': 'Collection Test Page',
+}]
+
+
+class TestFileResultsStore(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.store = FileResultsStore(self.directory)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_roundtrip(self):
+        self.store.set('key', 42, [1, 2, 3])
+        counter, rids = self.store.get('key')
+        self.assertEqual(counter, 42)
+        self.assertEqual(list(rids), [1, 2, 3])
+
+    def test_directory_required(self):
+        self.assertRaises(ValueError, FileResultsStore)
+
+    def test_existing_directory(self):
+        store = FileResultsStore(self.directory)
+        self.assertEqual(store.directory, self.directory)
+
+    def test_missing(self):
+        self.assertEqual(self.store.get('missing'), None)
+
+    def test_expired(self):
+        self.store.set('key', 42, [1])
+        self.store.max_age = -1
+        self.assertEqual(self.store.get('key'), None)
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_sweep(self):
+        self.store.set('old', 42, [1])
+        expired = time() - self.store.max_age - 1
+        os.utime(os.path.join(self.directory, 'old.rids'), (expired, expired))
+        # the last sweep is long enough ago
+        self.store._swept = expired
+        self.store.set('new', 43, [2])
+        self.assertEqual(os.listdir(self.directory), ['new.rids'])
+
+    def test_clear(self):
+        self.store.set('key', 42, [1])
+        self.store.clear()
+        self.assertEqual(os.listdir(self.directory), [])
+
+
+class TestSharedResults(unittest.TestCase):
+
+    layer = PLONEAPPCOLLECTION_INTEGRATION_TESTING
+
+    def setUp(self):
+        self.portal = self.layer['portal']
+        setRoles(self.portal, TEST_USER_ID, ['Manager'])
+        login(self.portal, TEST_USER_NAME)
+        self.portal.invokeFactory('Document',
+                                  'doc1',
+                                  title='Collection Test Page')
+        self.portal.invokeFactory('Collection', 'col')
+        self.collection = self.portal['col']
+        self.collection.setQuery(query)
+        self.directory = tempfile.mkdtemp()
+        self.store = FileResultsStore(self.directory)
+        getGlobalSiteManager().registerUtility(self.store, IResultsStore)
+
+    def tearDown(self):
+        getGlobalSiteManager().unregisterUtility(self.store, IResultsStore)
+        shutil.rmtree(self.directory)
+
+    def test_authenticated_results_are_shared(self):
+        for userid in ('editor1', 'editor2'):
+            self.portal.acl_users.userFolderAddUser(userid, 'secret',
+                                                    ['Manager'], [])
+        login(self.portal, 'editor1')
+        results = self.collection.results(batch=False)
+        self.assertEqual(len(os.listdir(self.directory)), 1)
+        self.assertEqual(results[0].Title(), 'Collection Test Page')
+        # a user with the same visibility shares the stored results
+        login(self.portal, 'editor2')
+        results = self.collection.results(batch=False)
+        self.assertEqual(len(os.listdir(self.directory)), 1)
+        self.assertEqual(results[0].Title(), 'Collection Test Page')
+
+    def test_restricted_results_are_not_shared(self):
+        doc = self.portal['doc1']
+        doc.manage_permission('View', ['Manager'], acquire=0)
+        doc.reindexObjectSecurity()
+        self.portal.acl_users.userFolderAddUser('editor', 'secret',
+                                                ['Manager'], [])
+        self.portal.acl_users.userFolderAddUser('member', 'secret',
+                                                ['Member'], [])
+        login(self.portal, 'editor')
+        self.assertEqual(len(self.collection.results(batch=False)), 1)
+        # a user who may not view the document must not get the entry
+        # stored for the editor
+        login(self.portal, 'member')
+        self.assertEqual(len(self.collection.results(batch=False)), 0)
+        self.assertEqual(len(os.listdir(self.directory)), 2)
+
+    def test_key_contains_language(self):
+        request = self.layer['request']
+        request.set('LANGUAGE', 'en')
+        english = cacheKey(self.collection, 'sortable_title', {})
+        request.set('LANGUAGE', 'de')
+        german = cacheKey(self.collection, 'sortable_title', {})
+        self.assertNotEqual(english, german)
+
+    def test_resultRids(self):
+        results = self.portal.portal_catalog(portal_type='Document')
+        self.assertEqual(resultRids(results),
+                         [brain.getRID() for brain in results])
+
+    def test_anonymous_results_are_shared(self):
+        logout()
+        results = self.collection.results(batch=False)
+        self.assertEqual(len(os.listdir(self.directory)), 1)
+        self.assertEqual(results[0].Title(), 'Collection Test Page')
+        # a second call is served from the store
+        results = self.collection.results(batch=False, brains=True)
+        self.assertEqual(results[0].Title, 'Collection Test Page')
@@ -0,0 +1,13 @@
+from Products.CMFCore.utils import getToolByName
+
+
+def addStreamingView(context):
+    """Make the streaming view selectable for collections."""
+    types = getToolByName(context, 'portal_types')
+    fti = types.getTypeInfo('Collection')
+    if fti is None:
+        return
+    view_methods = tuple(fti.view_methods)
+    if 'streaming_view' not in view_methods:
+        fti.manage_changeProperties(
+            view_methods=view_methods + ('streaming_view', ))
@@ -29,7 +29,9 @@ setup(name='plone.app.collection',
           'plone.app.querystring>=1.2.2',  # custom_query support
           'plone.app.vocabularies',
           'plone.app.widgets',
+          'plone.memoize',
           'plone.portlet.collection',
+          'plone.protect',
           'plone.portlets',
           'Products.Archetypes',
           'Products.CMFCore',